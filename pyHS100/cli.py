@@ -1,14 +1,27 @@
 """pyHS100 cli tool."""
 import asyncio
+import ipaddress
+import json
 import logging
+import os
+import socket
 import sys
-from pprint import pformat as pf
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional
 
 import click
 
-from pyHS100 import Discover, SmartBulb, SmartDevice, SmartStrip
-
-from pyHS100 import SmartPlug  # noqa: E402; noqa: E402
+from pyHS100 import (
+    Discover,
+    EmeterStatus,
+    SmartBulb,
+    SmartDevice,
+    SmartDeviceException,
+    SmartPlug,
+    SmartStrip,
+    TPLinkSmartHomeProtocol,
+)
 
 if sys.version_info < (3, 6):
     print("To use this script you need Python 3.6 or newer! got %s" % sys.version_info)
@@ -17,6 +30,9 @@ if sys.version_info < (3, 6):
 
 pass_dev = click.make_pass_decorator(SmartDevice)
 
+HOST_CACHE_TTL = 300
+DEVICE_CLASSES = {cls.__name__: cls for cls in (SmartBulb, SmartPlug, SmartStrip)}
+
 
 @click.group(invoke_without_command=True)
 @click.option(
@@ -58,6 +74,17 @@ def cli(ctx, ip, host, alias, target, debug, bulb, plug, strip):
     else:
         logging.basicConfig(level=logging.INFO)
 
+    # Share a single event loop and protocol for the whole invocation
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    protocol = TPLinkSmartHomeProtocol()
+
+    def close():
+        loop.run_until_complete(protocol.close())
+        loop.close()
+
+    ctx.call_on_close(close)
+
     if ctx.invoked_subcommand == "discover":
         return
 
@@ -65,7 +92,7 @@ def cli(ctx, ip, host, alias, target, debug, bulb, plug, strip):
         host = ip
 
     if alias is not None and host is None:
-        click.echo("Alias is given, using discovery to find host %s" % alias)
+        click.echo(f"Alias is given, using discovery to find host {alias}")
         host = find_host_from_alias(alias=alias, target=target)
         if host:
             click.echo(f"Found hostname is {host}")
@@ -78,15 +105,44 @@ def cli(ctx, ip, host, alias, target, debug, bulb, plug, strip):
         ctx.invoke(discover)
         return
     else:
+        address = resolve_host(host)
+        # Reuse a single connection for detecting the device type
+        # and for all the queries of this invocation
+        try:
+            loop.run_until_complete(protocol.connect(address))
+        except (OSError, asyncio.TimeoutError):
+            # The cached address may be stale, e.g. after a DHCP change
+            refreshed = resolve_host(host, refresh=True)
+            if refreshed == address:
+                raise
+            address = refreshed
+            loop.run_until_complete(protocol.connect(address))
+        host = address
+
         if not bulb and not plug and not strip:
-            click.echo("No --strip nor --bulb nor --plug given, discovering..")
-            dev = asyncio.run(Discover.discover_single(host))
+            # Skip the detection query for recently detected devices
+            device_class = _cached_device_class(host)
+            if device_class is None:
+                click.echo("No --strip nor --bulb nor --plug given, discovering..")
+                info = loop.run_until_complete(
+                    protocol.query(host, Discover.DISCOVERY_QUERY)
+                )
+                device_class = Discover._get_device_class(info)
+                if device_class is None:
+                    click.echo(
+                        "Unable to detect type, use --strip or --bulb or --plug!"
+                    )
+                    return
+                _store_device_class(host, device_class)
+            # The device is created outside of the running loop, as strips
+            # query their children synchronously on initialization.
+            dev = device_class(host, protocol=protocol, ioloop=loop)
         elif bulb:
-            dev = SmartBulb(host)
+            dev = SmartBulb(host, protocol=protocol, ioloop=loop)
         elif plug:
-            dev = SmartPlug(host)
+            dev = SmartPlug(host, protocol=protocol, ioloop=loop)
         elif strip:
-            dev = SmartStrip(host)
+            dev = SmartStrip(host, protocol=protocol, ioloop=loop)
         else:
             click.echo("Unable to detect type, use --strip or --bulb or --plug!")
             return
@@ -109,33 +165,70 @@ def dump_discover(ctx, save):
         model = dev["system"]["get_sysinfo"]["model"]
         hw_version = dev["system"]["get_sysinfo"]["hw_ver"]
         save_to = f"{model}_{hw_version}.json"
-        click.echo("Saving info to %s" % save_to)
+        click.echo(f"Saving info to {save_to}")
         with open(save_to, "w") as f:
-            import json
-
-            json.dump(dev, f, sort_keys=True, indent=4)
+            f.write(json.dumps(dev, sort_keys=True, indent=4))
 
 
 @cli.command()
 @click.option("--timeout", default=3, required=False)
 @click.option("--discover-only", default=False)
 @click.option("--dump-raw", is_flag=True)
+@click.option(
+    "--expected",
+    type=click.IntRange(min=1),
+    default=None,
+    required=False,
+    help="Stop discovering once this many devices have been found.",
+)
+@click.option(
+    "--parallel",
+    type=click.IntRange(min=1),
+    default=10,
+    help="How many of the found devices to query at the same time.",
+)
 @click.pass_context
-def discover(ctx, timeout, discover_only, dump_raw):
+def discover(ctx, timeout, discover_only, dump_raw, expected, parallel):
     """Discover devices in the network."""
     target = ctx.parent.params["target"]
-    click.echo("Discovering devices for %s seconds" % timeout)
+    click.echo(f"Discovering devices for {timeout} seconds")
     found_devs = Discover.discover(
-        target=target, timeout=timeout, return_raw=dump_raw
+        target=target,
+        timeout=timeout,
+        return_raw=dump_raw,
+        expected_devices=expected,
     ).items()
     if not discover_only:
-        for ip, dev in found_devs:
-            if dump_raw:
+        if dump_raw:
+            for ip, dev in found_devs:
                 click.echo(dev)
-                continue
-            ctx.obj = dev
-            ctx.invoke(state)
-            print()
+            return found_devs
+
+        loop = asyncio.get_event_loop()
+        semaphore = asyncio.Semaphore(parallel)
+
+        async def collect(dev):
+            async with semaphore:
+                try:
+                    return dev, await _collect_state(dev), None
+                except (SmartDeviceException, OSError, asyncio.TimeoutError) as ex:
+                    return dev, None, ex
+
+        # Query the found devices concurrently and print each of them
+        # as soon as its state is available
+        tasks = [loop.create_task(collect(dev)) for ip, dev in found_devs]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                dev, collected, error = loop.run_until_complete(next_done)
+                if error is not None:
+                    click.echo(click.style(f"== {dev.host}: {error} ==", fg="red"))
+                else:
+                    _echo_state(dev, *collected)
+                print()
+        finally:
+            for task in tasks:
+                task.cancel()
+            loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
 
     return found_devs
 
@@ -144,23 +237,117 @@ def find_host_from_alias(alias, target="255.255.255.255", timeout=1, attempts=3)
     """Discover a device identified by its alias."""
     host = None
     click.echo(
-        "Trying to discover %s using %s attempts of %s seconds"
-        % (alias, attempts, timeout)
+        f"Trying to discover {alias} using {attempts} attempts of {timeout} seconds"
     )
     for attempt in range(1, attempts):
         click.echo(f"Attempt {attempt} of {attempts}")
-        found_devs = Discover.discover(target=target, timeout=timeout).items()
-        for ip, dev in found_devs:
-            if dev.alias.lower() == alias.lower():
-                host = dev.host
+        # The discovery responses already contain the sysinfo,
+        # so there is no need to query the found devices one by one.
+        found_devs = Discover.discover(
+            target=target, timeout=timeout, return_raw=True
+        ).items()
+        for ip, info in found_devs:
+            if info["system"]["get_sysinfo"]["alias"].lower() == alias.lower():
+                host = ip
                 return host
     return None
 
 
+def resolve_host(host, refresh=False):
+    """Resolve a host name to an IP address using a short-lived disk cache.
+
+    The cache is kept for `HOST_CACHE_TTL` seconds and can be disabled
+    by setting the PYHS100_NO_DNS_CACHE environment variable.
+    Pass `refresh` to ignore the cached address and resolve the name again.
+    """
+    try:
+        ipaddress.ip_address(host)
+        return host
+    except ValueError:
+        pass
+
+    if os.environ.get("PYHS100_NO_DNS_CACHE"):
+        return host
+
+    cache = _read_cache("hosts.json")
+    now = datetime.now().timestamp()
+    if not refresh and host in cache and cache[host][1] > now:
+        return cache[host][0]
+
+    try:
+        addrinfo = socket.getaddrinfo(
+            host, TPLinkSmartHomeProtocol.DEFAULT_PORT, type=socket.SOCK_STREAM
+        )
+    except socket.gaierror:
+        # Let the connection attempt report the failure
+        cache.pop(host, None)
+        _write_cache("hosts.json", cache)
+        return host
+    ip = addrinfo[0][4][0]
+
+    cache[host] = (ip, now + HOST_CACHE_TTL)
+    _write_cache("hosts.json", cache)
+
+    return ip
+
+
+def _cached_device_class(address):
+    """Return the device class detected earlier for an address, if still fresh."""
+    cache = _read_cache("devices.json")
+    if address in cache and cache[address][1] > datetime.now().timestamp():
+        return DEVICE_CLASSES.get(cache[address][0])
+
+    return None
+
+
+def _store_device_class(address, device_class):
+    """Remember the detected device class of an address for `HOST_CACHE_TTL`."""
+    cache = _read_cache("devices.json")
+    expires = datetime.now().timestamp() + HOST_CACHE_TTL
+    cache[address] = (device_class.__name__, expires)
+    _write_cache("devices.json", cache)
+
+
+def _cache_file(name):
+    """Return the path of a cache file in the user's cache directory."""
+    cache_dir = Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache"))
+    return cache_dir / "pyHS100" / name
+
+
+def _read_cache(name):
+    """Load a cache of values with their expiry time, empty if it is unusable."""
+    try:
+        cache = json.loads(_cache_file(name).read_text())
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(cache, dict) or not all(
+        isinstance(entry, list)
+        and len(entry) == 2
+        and isinstance(entry[0], str)
+        and isinstance(entry[1], (int, float))
+        for entry in cache.values()
+    ):
+        return {}
+
+    return cache
+
+
+def _write_cache(name, cache):
+    """Store a cache, failures only disable caching."""
+    cache_file = _cache_file(name)
+    try:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        cache_file.write_text(json.dumps(cache))
+    except OSError as ex:
+        logging.debug("Unable to write the cache: %s", ex)
+
+
 @cli.command()
 @pass_dev
 def sysinfo(dev):
     """Print out full system information."""
+    from pprint import pformat as pf
+
     dev.sync.update()
     click.echo(click.style("== System info ==", bold=True))
     click.echo(pf(dev.sys_info))
@@ -168,27 +355,27 @@ def sysinfo(dev):
 
 @cli.command()
 @pass_dev
-@click.pass_context
-def state(ctx, dev: SmartDevice):
+def state(dev: SmartDevice):
     """Print out device state and versions."""
-    dev.sync.update()
-    click.echo(click.style("== {} - {} ==".format(dev.alias, dev.model), bold=True))
+    device_time, emeter_status = dev.ioloop.run_until_complete(_collect_state(dev))
+    _echo_state(dev, device_time, emeter_status)
 
-    click.echo(
-        click.style(
-            "Device state: {}".format("ON" if dev.is_on else "OFF"),
-            fg="green" if dev.is_on else "red",
-        )
-    )
+
+def _echo_state(dev: SmartDevice, device_time, emeter_status):
+    """Print out the state of an already updated device."""
+    click.echo(click.style(f"== {dev.alias} - {dev.model} ==", bold=True))
+
+    is_on = dev.is_on
+    status = "ON" if is_on else "OFF"
+    click.echo(click.style(f"Device state: {status}", fg="green" if is_on else "red"))
     if dev.is_strip:
+        # _collect_state updates the children along with the strip
         for plug in dev.plugs:  # type: ignore
-            plug.sync.update()
             is_on = plug.is_on
-            alias = plug.alias
+            status = "ON" if is_on else "OFF"
             click.echo(
                 click.style(
-                    "  * {} state: {}".format(alias, ("ON" if is_on else "OFF")),
-                    fg="green" if is_on else "red",
+                    f"  * {plug.alias} state: {status}", fg="green" if is_on else "red"
                 )
             )
 
@@ -196,13 +383,70 @@ def state(ctx, dev: SmartDevice):
     for k, v in dev.state_information.items():
         click.echo(f"{k}: {v}")
     click.echo(click.style("== Generic information ==", bold=True))
-    click.echo("Time:         {}".format(dev.sync.get_time()))
-    click.echo("Hardware:     {}".format(dev.hw_info["hw_ver"]))
-    click.echo("Software:     {}".format(dev.hw_info["sw_ver"]))
-    click.echo("MAC (rssi):   {} ({})".format(dev.mac, dev.rssi))
-    click.echo("Location:     {}".format(dev.location))
+    click.echo(f"Time:         {device_time}")
+    hw_info = dev.hw_info
+    click.echo(f"Hardware:     {hw_info['hw_ver']}")
+    click.echo(f"Software:     {hw_info['sw_ver']}")
+    click.echo(f"MAC (rssi):   {dev.mac} ({dev.rssi})")
+    click.echo(f"Location:     {dev.location}")
+
+    click.echo(click.style("== Emeter ==", bold=True))
+    if emeter_status is None:
+        click.echo("Device has no emeter")
+    else:
+        click.echo("== Current State ==")
+        _echo_emeter_status(emeter_status)
+
+
+async def _collect_state(dev: SmartDevice):
+    """Update the device and fetch its time and current emeter readings.
 
-    ctx.invoke(emeter)
+    Everything is fetched with a single request to the device,
+    the children of a strip are updated with a request of their own.
+
+    :return: tuple of the device time and the emeter readings,
+             the latter being None for devices without an emeter
+    """
+    request: Dict[str, Dict[str, Optional[Dict]]] = {
+        "system": {"get_sysinfo": None},
+        "time": {"get_time": None},
+        dev.emeter_type: {"get_realtime": None},
+    }
+    if dev.is_bulb:
+        request[dev.LIGHT_SERVICE] = {"get_light_state": None}  # type: ignore
+    res = await dev._query_helper_multi(request)
+
+    if "get_sysinfo" not in res.get("system", {}):
+        raise SmartDeviceException(f"Unable to fetch sysinfo from {dev.host}")
+    dev._sys_info = res["system"]["get_sysinfo"]
+    if dev.is_bulb:
+        light_state = res.get(dev.LIGHT_SERVICE, {}).get("get_light_state")  # type: ignore
+        if light_state is None:
+            light_state = await dev.get_light_state()  # type: ignore
+        dev._light_state = light_state  # type: ignore
+    if dev.is_strip:
+        await asyncio.gather(*(plug.update() for plug in dev.plugs))  # type: ignore
+
+    device_time = _time_from_response(res.get("time", {}).get("get_time"))
+
+    emeter_status = None
+    if dev.has_emeter:
+        realtime = res.get(dev.emeter_type, {}).get("get_realtime")
+        if realtime is not None:
+            emeter_status = EmeterStatus(realtime)
+        else:
+            emeter_status = await dev.get_emeter_realtime()
+
+    return device_time, emeter_status
+
+
+def _time_from_response(res) -> Optional[datetime]:
+    """Convert a `get_time` response to a datetime, None if not available."""
+    if res is None:
+        return None
+    return datetime(
+        res["year"], res["month"], res["mday"], res["hour"], res["min"], res["sec"]
+    )
 
 
 @cli.command()
@@ -224,10 +468,14 @@ def alias(dev, new_alias):
 @click.argument("parameters", default=None, required=False)
 def raw_command(dev: SmartDevice, module, command, parameters):
     """Run a raw command on the device."""
-    import ast
-
     if parameters is not None:
-        parameters = ast.literal_eval(parameters)
+        try:
+            parameters = json.loads(parameters)
+        except ValueError:
+            # Not JSON, accept Python literals (e.g. single quotes, None)
+            import ast
+
+            parameters = ast.literal_eval(parameters)
     res = dev.sync._query_helper(module, command, parameters)
     dev.sync.update()
     click.echo(res)
@@ -238,8 +486,18 @@ def raw_command(dev: SmartDevice, module, command, parameters):
 @click.option("--year", type=click.DateTime(["%Y"]), default=None, required=False)
 @click.option("--month", type=click.DateTime(["%Y-%m"]), default=None, required=False)
 @click.option("--erase", is_flag=True)
-def emeter(dev, year, month, erase):
+@click.option(
+    "--full",
+    is_flag=True,
+    help="Show the current state together with this month and this year.",
+)
+def emeter(dev, year, month, erase, full):
     """Query emeter for historical consumption."""
+    if full and (year or month):
+        raise click.BadOptionUsage(
+            "full", "--full cannot be combined with --year or --month."
+        )
+
     click.echo(click.style("== Emeter ==", bold=True))
     dev.sync.update()
     if not dev.has_emeter:
@@ -251,6 +509,19 @@ def emeter(dev, year, month, erase):
         dev.sync.erase_emeter_stats()
         return
 
+    if full:
+        now = datetime.now()
+        realtime, daily, monthly = dev.ioloop.run_until_complete(
+            _full_emeter(dev, now.year, now.month)
+        )
+        click.echo("== Current State ==")
+        _echo_emeter_status(realtime)
+        click.echo(f"== For month {now.month} of {now.year} ==")
+        _echo_emeter_status(daily)
+        click.echo(f"== For year {now.year} ==")
+        _echo_emeter_status(monthly)
+        return
+
     if year:
         click.echo(f"== For year {year.year} ==")
         emeter_status = dev.sync.get_emeter_monthly(year.year)
@@ -261,9 +532,23 @@ def emeter(dev, year, month, erase):
         emeter_status = dev.sync.get_emeter_realtime()
         click.echo("== Current State ==")
 
+    _echo_emeter_status(emeter_status)
+
+
+async def _full_emeter(dev, year, month):
+    """Fetch the current, daily and monthly emeter statistics concurrently."""
+    return await asyncio.gather(
+        dev.get_emeter_realtime(),
+        dev.get_emeter_daily(year=year, month=month),
+        dev.get_emeter_monthly(year=year),
+    )
+
+
+def _echo_emeter_status(emeter_status):
+    """Print out emeter readings, one line per plug for multi-plug devices."""
     if isinstance(emeter_status, list):
-        for plug in emeter_status:
-            click.echo("Plug %d: %s" % (emeter_status.index(plug) + 1, plug))
+        for index, plug in enumerate(emeter_status, 1):
+            click.echo(f"Plug {index}: {plug}")
     else:
         click.echo(str(emeter_status))
 
@@ -278,9 +563,9 @@ def brightness(dev, brightness):
         click.echo("This device does not support brightness.")
         return
     if brightness is None:
-        click.echo("Brightness: %s" % dev.brightness)
+        click.echo(f"Brightness: {dev.brightness}")
     else:
-        click.echo("Setting brightness to %s" % brightness)
+        click.echo(f"Setting brightness to {brightness}")
         dev.sync.set_brightness(brightness)
 
 
@@ -293,9 +578,9 @@ def temperature(dev: SmartBulb, temperature):
     """Get or set color temperature."""
     if temperature is None:
         click.echo(f"Color temperature: {dev.color_temp}")
-        valid_temperature_range = dev.valid_temperature_range
-        if valid_temperature_range != (0, 0):
-            click.echo("(min: {}, max: {})".format(*valid_temperature_range))
+        min_temperature, max_temperature = dev.valid_temperature_range
+        if (min_temperature, max_temperature) != (0, 0):
+            click.echo(f"(min: {min_temperature}, max: {max_temperature})")
         else:
             click.echo(
                 "Temperature range unknown, please open a github issue"
@@ -315,7 +600,8 @@ def temperature(dev: SmartBulb, temperature):
 def hsv(dev, ctx, h, s, v):
     """Get or set color in HSV. (Bulb only)."""
     if h is None or s is None or v is None:
-        click.echo("Current HSV: %s %s %s" % dev.hsv)
+        hue, saturation, value = dev.hsv
+        click.echo(f"Current HSV: {hue} {saturation} {value}")
     elif s is None or v is None:
         raise click.BadArgumentUsage("Setting a color requires 3 values.", ctx)
     else:
@@ -329,10 +615,10 @@ def hsv(dev, ctx, h, s, v):
 def led(dev, state):
     """Get or set (Plug's) led state."""
     if state is not None:
-        click.echo("Turning led to %s" % state)
+        click.echo(f"Turning led to {state}")
         dev.sync.set_led(state)
     else:
-        click.echo("LED state: %s" % dev.led)
+        click.echo(f"LED state: {dev.led}")
 
 
 @cli.command()
@@ -343,27 +629,37 @@ def time(dev):
 
 
 @cli.command()
-@click.argument("index", type=int, required=False)
+@click.argument("index", type=click.IntRange(min=1), required=False)
 @pass_dev
 def on(plug, index):
     """Turn the device on."""
     click.echo("Turning on..")
-    if index is None:
-        plug.turn_on()
-    else:
-        plug.turn_on(index=(index - 1))
+    _toggle(plug, index, True)
 
 
 @cli.command()
-@click.argument("index", type=int, required=False)
+@click.argument("index", type=click.IntRange(min=1), required=False)
 @pass_dev
 def off(plug, index):
     """Turn the device off."""
     click.echo("Turning off..")
-    if index is None:
-        plug.turn_off()
+    _toggle(plug, index, False)
+
+
+def _toggle(plug, index, turn_on):
+    """Turn the device, or the outlet with the given (1-based) index, on or off."""
+    if index is not None:
+        if not plug.is_strip:
+            raise click.BadArgumentUsage("Only strips support choosing an outlet.")
+        if index > len(plug.plugs):
+            raise click.BadParameter(
+                f"the strip has only {len(plug.plugs)} outlets.", param_hint="index"
+            )
+        plug = plug.plugs[index - 1]
+    if turn_on:
+        plug.sync.turn_on()
     else:
-        plug.turn_off(index=(index - 1))
+        plug.sync.turn_off()
 
 
 @cli.command()
@@ -372,7 +668,7 @@ def off(plug, index):
 def reboot(plug, delay):
     """Reboot the device."""
     click.echo("Rebooting the device..")
-    plug.reboot(delay)
+    plug.sync.reboot(delay)
 
 
 if __name__ == "__main__":
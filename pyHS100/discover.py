@@ -2,7 +2,8 @@
 import json
 import logging
 import socket
-from typing import Dict, Optional, Type
+import time
+from typing import Any, Dict, Optional, Type
 
 from pyHS100.protocol import TPLinkSmartHomeProtocol
 from pyHS100.smartbulb import SmartBulb
@@ -44,6 +45,7 @@ class Discover:
         timeout: int = 3,
         discovery_packets=3,
         return_raw=False,
+        expected_devices: int = None,
     ) -> Dict[str, SmartDevice]:
         """Discover devices.
 
@@ -55,16 +57,24 @@ class Discover:
         :param target: The target broadcast address (e.g. 192.168.xxx.255).
         :param timeout: How long to wait for responses, defaults to 3
         :param port: port to send broadcast messages, defaults to 9999.
+        :param expected_devices: Stop waiting as soon as this many devices
+                                 have responded (default: wait for the timeout)
         :rtype: dict
         :return: Array of json objects {"ip", "port", "sys_info"}
+        :raises ValueError: if expected_devices is smaller than 1
         """
+        if expected_devices is not None and expected_devices < 1:
+            raise ValueError(
+                "Invalid expected_devices value: {} "
+                "(valid range: 1 or more)".format(expected_devices)
+            )
+
         if protocol is None:
             protocol = TPLinkSmartHomeProtocol()
 
         sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
         sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        sock.settimeout(timeout)
 
         req = json.dumps(Discover.DISCOVERY_QUERY)
         _LOGGER.debug("Sending discovery to %s:%s", target, port)
@@ -73,11 +83,18 @@ class Discover:
         for i in range(discovery_packets):
             sock.sendto(encrypted_req[4:], (target, port))
 
-        devices = {}
+        devices: Dict[str, Any] = {}
         _LOGGER.debug("Waiting %s seconds for responses...", timeout)
 
+        deadline = time.monotonic() + timeout
         try:
-            while True:
+            while expected_devices is None or len(devices) < expected_devices:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                # Wait only for the rest of the timeout, so that responses
+                # do not keep extending the discovery.
+                sock.settimeout(remaining)
                 data, addr = sock.recvfrom(4096)
                 ip, port = addr
                 info = json.loads(protocol.decrypt(data))
@@ -90,6 +107,8 @@ class Discover:
             _LOGGER.debug("Got socket timeout, which is okay.")
         except Exception as ex:
             _LOGGER.error("Got exception %s", ex, exc_info=True)
+        finally:
+            sock.close()
         _LOGGER.debug("Found %s devices: %s", len(devices), devices)
         return devices
 
@@ -111,7 +130,7 @@ class Discover:
 
         device_class = Discover._get_device_class(info)
         if device_class is not None:
-            return device_class(host)
+            return device_class(host, protocol=protocol)
 
         return None
 
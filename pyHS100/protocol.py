@@ -10,14 +10,33 @@ which are licensed under the Apache License, Version 2.0
 http://www.apache.org/licenses/LICENSE-2.0
 """
 import asyncio
+import functools
 import json
 import logging
 import struct
-from typing import Any, Dict, Union
+import types
+from typing import Any, Dict, Tuple, Union
 
 _LOGGER = logging.getLogger(__name__)
 
 
+class _instance_or_class_method:
+    """Bind a method to a fresh instance when it is accessed on the class.
+
+    Keeps `TPLinkSmartHomeProtocol.query(host, request)` working as it did
+    when `query` was a static method.
+    """
+
+    def __init__(self, func):
+        self.func = func
+        functools.update_wrapper(self, func)
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            instance = owner()
+        return types.MethodType(self.func, instance)
+
+
 class TPLinkSmartHomeProtocol:
     """Implementation of the TP-Link Smart Home protocol."""
 
@@ -25,9 +44,39 @@ class TPLinkSmartHomeProtocol:
     DEFAULT_PORT = 9999
     DEFAULT_TIMEOUT = 5
 
-    @staticmethod
+    def __init__(self) -> None:
+        self._connections: Dict[
+            Tuple[str, int],
+            Tuple[asyncio.StreamReader, asyncio.StreamWriter, asyncio.Lock],
+        ] = {}
+
+    async def connect(self, host: str, port: int = DEFAULT_PORT) -> None:
+        """Open a persistent connection to a TP-Link SmartHome Device.
+
+        Subsequent queries to the same host and port are sent over this
+        connection instead of opening a new one for every request,
+        until `close` is called.
+
+        :param str host: host name or ip address of the device
+        :param int port: port on the device (default: 9999)
+        """
+        if (host, port) in self._connections:
+            return
+
+        task = asyncio.open_connection(host, port)
+        reader, writer = await asyncio.wait_for(
+            task, timeout=TPLinkSmartHomeProtocol.DEFAULT_TIMEOUT
+        )
+        self._connections[(host, port)] = (reader, writer, asyncio.Lock())
+
+    async def close(self) -> None:
+        """Close all persistent connections opened with `connect`."""
+        for host, port in list(self._connections):
+            await self._drop_connection(host, port)
+
+    @_instance_or_class_method
     async def query(
-        host: str, request: Union[str, Dict], port: int = DEFAULT_PORT
+        self, host: str, request: Union[str, Dict], port: int = DEFAULT_PORT
     ) -> Any:
         """Request information from a TP-Link SmartHome Device.
 
@@ -40,32 +89,95 @@ class TPLinkSmartHomeProtocol:
         if isinstance(request, dict):
             request = json.dumps(request)
 
+        connection = self._connections.get((host, port))
+        if connection is not None:
+            pooled_reader, pooled_writer, lock = connection
+            async with lock:
+                # Give the event loop a chance to notice that the device
+                # has closed the connection since it was last used.
+                await asyncio.sleep(0)
+                sent = False
+                if not pooled_reader.at_eof():
+                    try:
+                        await self._send(pooled_writer, request)
+                        sent = True
+                    except OSError as ex:
+                        _LOGGER.debug(
+                            "Persistent connection to %s failed: %s", host, ex
+                        )
+
+                if sent:
+                    # The request may already have been executed, so it is
+                    # not safe to resend it on another connection.
+                    try:
+                        buffer = await self._receive(pooled_reader)
+                    except Exception:
+                        await self._drop_connection(host, port)
+                        raise
+                    if pooled_reader.at_eof():
+                        await self._drop_connection(host, port)
+                    return self._decode(buffer)
+
+                # Nothing was sent, stop reusing the connection
+                # and fall back to a connection per request.
+                await self._drop_connection(host, port)
+
         timeout = TPLinkSmartHomeProtocol.DEFAULT_TIMEOUT
         writer = None
         try:
             task = asyncio.open_connection(host, port)
             reader, writer = await asyncio.wait_for(task, timeout=timeout)
-            _LOGGER.debug("> (%i) %s", len(request), request)
-            writer.write(TPLinkSmartHomeProtocol.encrypt(request))
-            await writer.drain()
-
-            buffer = bytes()
-            # Some devices send responses with a length header of 0 and
-            # terminate with a zero size chunk. Others send the length and
-            # will hang if we attempt to read more data.
-            length = -1
-            while True:
-                chunk = await reader.read(4096)
-                if length == -1:
-                    length = struct.unpack(">I", chunk[0:4])[0]
-                buffer += chunk
-                if (length > 0 and len(buffer) >= length + 4) or not chunk:
-                    break
+            await self._send(writer, request)
+            buffer = await self._receive(reader)
         finally:
             if writer:
                 writer.close()
                 await writer.wait_closed()
 
+        return self._decode(buffer)
+
+    async def _drop_connection(self, host: str, port: int) -> None:
+        """Close a persistent connection and stop reusing it."""
+        connection = self._connections.pop((host, port), None)
+        if connection is None:
+            return
+        _, writer, _ = connection
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except OSError as ex:
+            _LOGGER.debug("Error while closing the connection to %s: %s", host, ex)
+
+    @staticmethod
+    async def _send(writer: asyncio.StreamWriter, request: str) -> None:
+        """Send an encrypted request."""
+        _LOGGER.debug("> (%i) %s", len(request), request)
+        writer.write(TPLinkSmartHomeProtocol.encrypt(request))
+        await writer.drain()
+
+    @staticmethod
+    async def _receive(reader: asyncio.StreamReader) -> bytes:
+        """Read the full encrypted response."""
+        buffer = bytes()
+        # Some devices send responses with a length header of 0 and
+        # terminate with a zero size chunk. Others send the length and
+        # will hang if we attempt to read more data.
+        length = -1
+        while True:
+            chunk = await reader.read(4096)
+            if length == -1:
+                if not chunk:
+                    raise ConnectionResetError("Connection closed by the device")
+                length = struct.unpack(">I", chunk[0:4])[0]
+            buffer += chunk
+            if (length > 0 and len(buffer) >= length + 4) or not chunk:
+                break
+
+        return buffer
+
+    @staticmethod
+    def _decode(buffer: bytes) -> Any:
+        """Decrypt and parse a response including its length header."""
         response = TPLinkSmartHomeProtocol.decrypt(buffer[4:])
         _LOGGER.debug("< (%i) %s", len(response), response)
 
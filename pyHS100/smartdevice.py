@@ -196,6 +196,10 @@ class SmartDevice:
             if response is None:
                 _LOGGER.debug("Got no result from cache, querying the device.")
                 response = await self.protocol.query(host=self.host, request=request)
+                if not cmd.startswith("get_"):
+                    # The command may have changed the state of the target,
+                    # so the cached results for it cannot be trusted anymore.
+                    self.cache[target].clear()
                 self._insert_to_cache(target, cmd, response)
         except Exception as ex:
             raise SmartDeviceException(f"Communication error on {target}:{cmd}") from ex
@@ -218,6 +222,59 @@ class SmartDevice:
 
         return result
 
+    async def _query_helper_multi(
+        self, request: Dict[str, Dict[str, Optional[Dict]]]
+    ) -> Dict[str, Dict[str, Any]]:
+        """Execute multiple commands using a single request.
+
+        The response is cached for each of the `get_` commands, so subsequent
+        `_query_helper` calls for them are served without querying the device.
+        As with `_query_helper`, any other command drops the cached results
+        of its target, including those of this request.
+
+        :param request: mapping of target systems to commands and their arguments,
+                        e.g. {"system": {"get_sysinfo": None}}
+        :return: Unwrapped results for the calls, failed commands are left out.
+        :rtype: dict
+        :raises SmartDeviceException: if the communication failed
+        """
+        query: Dict[str, Any] = dict(request)
+        if self.context is not None:
+            query["context"] = {"child_ids": [self.context]}
+
+        try:
+            response = await self.protocol.query(host=self.host, request=query)
+        except Exception as ex:
+            raise SmartDeviceException(
+                f"Communication error on {', '.join(request)}"
+            ) from ex
+
+        results: Dict[str, Dict[str, Any]] = defaultdict(dict)
+        for target, cmds in request.items():
+            # The commands may have changed the state of the target,
+            # so the cached results for it cannot be trusted anymore.
+            cacheable = all(cmd.startswith("get_") for cmd in cmds)
+            if not cacheable:
+                self.cache[target].clear()
+
+            result = response.get(target, {})
+            if "err_code" in result and result["err_code"] != 0:
+                _LOGGER.debug("Error on %s: %s", target, result)
+                continue
+            for cmd in cmds:
+                if cmd not in result:
+                    continue
+                if "err_code" in result[cmd] and result[cmd]["err_code"] != 0:
+                    _LOGGER.debug("Error on %s.%s: %s", target, cmd, result[cmd])
+                    continue
+                if cacheable:
+                    self._insert_to_cache(target, cmd, response)
+                results[target][cmd] = {
+                    k: v for k, v in result[cmd].items() if k != "err_code"
+                }
+
+        return results
+
     def has_emeter(self) -> bool:
         """Return if device has an energy meter.
 
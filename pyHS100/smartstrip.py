@@ -2,6 +2,7 @@
 
 .. todo:: describe how this interfaces with single plugs.
 """
+import asyncio
 import datetime
 import logging
 from collections import defaultdict
@@ -49,7 +50,9 @@ class SmartStrip(SmartPlug):
         cache_ttl: int = 3,
         ioloop=None,
     ) -> None:
-        SmartPlug.__init__(self, host=host, protocol=protocol, cache_ttl=cache_ttl)
+        SmartPlug.__init__(
+            self, host=host, protocol=protocol, cache_ttl=cache_ttl, ioloop=ioloop
+        )
         self.emeter_type = "emeter"
         self._device_type = DeviceType.Strip
         self.plugs: List[SmartPlug] = []
@@ -59,10 +62,10 @@ class SmartStrip(SmartPlug):
             self.plugs.append(
                 SmartPlug(
                     host,
-                    protocol,
+                    self.protocol,
                     context=child["id"],
                     cache_ttl=cache_ttl,
-                    ioloop=ioloop,
+                    ioloop=self.ioloop,
                 )
             )
 
@@ -82,8 +85,7 @@ class SmartStrip(SmartPlug):
         Needed for methods that are decorated with `requires_update`.
         """
         await super().update()
-        for plug in self.plugs:
-            await plug.update()
+        await asyncio.gather(*(plug.update() for plug in self.plugs))
 
     async def turn_on(self):
         """Turn the strip on.
@@ -185,7 +187,7 @@ class SmartStrip(SmartPlug):
         emeter_monthly: DefaultDict[int, float] = defaultdict(lambda: 0.0)
         for plug in self.plugs:
             plug_emeter_monthly = await plug.get_emeter_monthly(year=year, kwh=kwh)
-            for month, value in plug_emeter_monthly:
+            for month, value in plug_emeter_monthly.items():
                 emeter_monthly[month] += value
         return emeter_monthly
 
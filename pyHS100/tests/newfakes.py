@@ -241,6 +241,7 @@ def success(target, cmd, res):
 
 class FakeTransportProtocol(TPLinkSmartHomeProtocol):
     def __init__(self, info, invalid=False):
+        super().__init__()
         # TODO remove invalid when removing the old tests.
         proto = FakeTransportProtocol.baseproto
         for target in info:
@@ -400,6 +401,15 @@ class FakeTransportProtocol(TPLinkSmartHomeProtocol):
         except KeyError:
             child_ids = []
 
+        if len(request) > 1:
+            response = {}
+            for target in request:
+                single_request = {target: request[target]}
+                if child_ids:
+                    single_request["context"] = {"child_ids": child_ids}
+                response.update(await self.query(host, single_request, port))
+            return response
+
         target = next(iter(request))
         if target not in proto.keys():
             return error(target, msg="target not found")
@@ -0,0 +1,142 @@
+import json
+import socket
+from unittest.mock import patch
+
+import pytest
+from click.testing import CliRunner
+
+from pyHS100 import Discover, SmartPlug, TPLinkSmartHomeProtocol
+from pyHS100.cli import cli, resolve_host
+
+from .conftest import filter_model, strip
+
+emeter_plug = pytest.mark.parametrize("dev", filter_model({"HS110"}), indirect=True)
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    return tmp_path / "pyHS100"
+
+
+def invoke_for(dev, *args):
+    """Run the cli with `dev` as the device behind --host."""
+    # The fake device only knows the modules present in its fixture
+    query = {"system": {"get_sysinfo": None}}
+    with patch.object(Discover, "DISCOVERY_QUERY", query), patch(
+        "pyHS100.cli.TPLinkSmartHomeProtocol", return_value=dev.protocol
+    ), patch.object(dev.protocol, "connect"):
+        return CliRunner().invoke(cli, ["--host", dev.host, *args])
+
+
+@emeter_plug
+def test_discover_continues_after_failed_device(dev):
+    broken = SmartPlug("123.123.123.124", protocol=TPLinkSmartHomeProtocol())
+    found = {broken.host: broken, dev.host: dev}
+
+    with patch("pyHS100.cli.Discover.discover", return_value=found), patch.object(
+        broken.protocol, "query", side_effect=OSError("unreachable")
+    ), patch.object(dev.protocol, "query", wraps=dev.protocol.query) as query:
+        res = CliRunner().invoke(cli, ["discover"])
+
+    assert res.exit_code == 0, res.output
+    assert f"== {broken.host}: Communication error" in res.output
+    assert f"== {dev.alias} - {dev.model} ==" in res.output
+    assert "== Current State ==" in res.output
+    # The state and the emeter readings are printed from a single request,
+    # the fake protocol queries itself once per target of that request.
+    device_calls = [call for call in query.call_args_list if "request" in call.kwargs]
+    assert len(device_calls) == 1
+
+
+@strip
+def test_detect_strip(dev):
+    res = invoke_for(dev, "sysinfo")
+
+    assert res.exit_code == 0, res.output
+    assert "'children'" in res.output
+
+
+@emeter_plug
+def test_detected_type_is_cached(dev):
+    first = invoke_for(dev, "sysinfo")
+    second = invoke_for(dev, "sysinfo")
+
+    assert "discovering" in first.output
+    assert second.exit_code == 0, second.output
+    assert "discovering" not in second.output
+    assert "== System info ==" in second.output
+
+
+def addrinfo(ip):
+    return [(socket.AF_INET, socket.SOCK_STREAM, 6, "", (ip, 9999))]
+
+
+def write_host_cache(cache_dir, contents):
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    (cache_dir / "hosts.json").write_text(contents)
+
+
+def read_host_cache(cache_dir):
+    return json.loads((cache_dir / "hosts.json").read_text())
+
+
+def test_resolve_host_uses_cache(cache_dir):
+    with patch(
+        "pyHS100.cli.socket.getaddrinfo", return_value=addrinfo("192.0.2.1")
+    ) as getaddrinfo:
+        assert resolve_host("plug.local") == "192.0.2.1"
+        assert resolve_host("plug.local") == "192.0.2.1"
+        assert resolve_host("192.0.2.2") == "192.0.2.2"
+
+    assert getaddrinfo.call_count == 1
+    assert read_host_cache(cache_dir)["plug.local"][0] == "192.0.2.1"
+
+
+def test_resolve_host_expired(cache_dir):
+    write_host_cache(cache_dir, json.dumps({"plug.local": ["192.0.2.1", 0]}))
+    with patch("pyHS100.cli.socket.getaddrinfo", return_value=addrinfo("192.0.2.2")):
+        assert resolve_host("plug.local") == "192.0.2.2"
+
+    assert read_host_cache(cache_dir)["plug.local"][0] == "192.0.2.2"
+
+
+def test_resolve_host_refresh(cache_dir):
+    write_host_cache(cache_dir, json.dumps({"plug.local": ["192.0.2.1", 4102444800]}))
+    with patch("pyHS100.cli.socket.getaddrinfo", return_value=addrinfo("192.0.2.2")):
+        assert resolve_host("plug.local") == "192.0.2.1"
+        assert resolve_host("plug.local", refresh=True) == "192.0.2.2"
+
+    assert read_host_cache(cache_dir)["plug.local"][0] == "192.0.2.2"
+
+
+@pytest.mark.parametrize(
+    "contents",
+    ["not json", "[]", '{"plug.local": "192.0.2.1"}', '{"plug.local": [1, 2]}'],
+)
+def test_resolve_host_malformed_cache(cache_dir, contents):
+    write_host_cache(cache_dir, contents)
+    with patch("pyHS100.cli.socket.getaddrinfo", return_value=addrinfo("192.0.2.2")):
+        assert resolve_host("plug.local") == "192.0.2.2"
+
+    assert list(read_host_cache(cache_dir)) == ["plug.local"]
+
+
+def test_resolve_host_unresolvable(cache_dir):
+    write_host_cache(
+        cache_dir,
+        json.dumps({"plug.local": ["192.0.2.1", 0], "bulb.local": ["192.0.2.3", 0]}),
+    )
+    with patch("pyHS100.cli.socket.getaddrinfo", side_effect=socket.gaierror):
+        assert resolve_host("plug.local") == "plug.local"
+
+    assert list(read_host_cache(cache_dir)) == ["bulb.local"]
+
+
+def test_resolve_host_cache_disabled(cache_dir, monkeypatch):
+    monkeypatch.setenv("PYHS100_NO_DNS_CACHE", "1")
+    with patch("pyHS100.cli.socket.getaddrinfo") as getaddrinfo:
+        assert resolve_host("plug.local") == "plug.local"
+
+    getaddrinfo.assert_not_called()
+    assert not cache_dir.exists()
@@ -72,6 +72,26 @@ def test_query_helper(dev):
     # TODO check for unwrapping?
 
 
+def test_query_helper_multi(dev):
+    res = dev.sync._query_helper_multi(
+        {"system": {"get_sysinfo": None}, "time": {"get_time": None}, "test": {}}
+    )
+    assert "err_code" not in res["system"]["get_sysinfo"]
+    assert res["time"]["get_time"]["year"] == 2017
+    assert "test" not in res
+
+
+def test_query_helper_multi_invalidates_cache(dev):
+    dev.cache_ttl = datetime.timedelta(seconds=60)
+    dev.sync.update()
+    assert "get_sysinfo" in dev.cache["system"]
+
+    dev.sync._query_helper_multi(
+        {"system": {"set_dev_alias": {"alias": dev.alias}, "get_sysinfo": None}}
+    )
+    assert "get_sysinfo" not in dev.cache["system"]
+
+
 @turn_on
 def test_state(dev, turn_on):
     handle_turn_on(dev, turn_on)
@@ -224,6 +244,19 @@ def test_alias(dev):
     assert dev.sync.alias == original
 
 
+def test_cache_invalidated_on_change(dev):
+    dev.cache_ttl = datetime.timedelta(seconds=60)
+    dev.sync.update()
+    original = dev.alias
+
+    with patch.object(dev.protocol, "query", wraps=dev.protocol.query) as query:
+        dev.sync.set_alias("TEST1234")
+    requests = [call[1]["request"] for call in query.call_args_list]
+    assert {"system": {"get_sysinfo": None}} in requests
+
+    dev.sync.set_alias(original)
+
+
 @plug
 def test_led(dev):
     dev.sync.update()
@@ -449,6 +482,18 @@ def test_children_alias(dev):
         assert plug.alias == original
 
 
+@strip
+def test_children_share_ioloop(dev):
+    ioloop = asyncio.new_event_loop()
+    try:
+        strip = SmartStrip(dev.host, protocol=dev.protocol, cache_ttl=0, ioloop=ioloop)
+        assert strip.ioloop is ioloop
+        for plug in strip.plugs:
+            assert plug.ioloop is ioloop
+    finally:
+        ioloop.close()
+
+
 @strip
 def test_children_on_since(dev):
     for plug in dev.plugs:
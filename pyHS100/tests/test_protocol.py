@@ -1,3 +1,4 @@
+import asyncio
 import json
 from unittest import TestCase
 
@@ -71,3 +72,90 @@ class TestTPLinkSmartHomeProtocol(TestCase):
         d = "{'snowman': '\u2603'}"
 
         self.assertEqual(d, TPLinkSmartHomeProtocol.decrypt(e))
+
+    def run_echo_server(self, run, close_after_reply=False, close_before_reply=False):
+        """Run `run(port)` against a device echoing the requests back."""
+        connections = []
+        self.requests = []
+
+        async def handle(reader, writer):
+            connections.append(writer)
+            while True:
+                header = await reader.read(4)
+                if not header:
+                    break
+                length = int.from_bytes(header, "big")
+                request = TPLinkSmartHomeProtocol.decrypt(await reader.read(length))
+                self.requests.append(request)
+                if close_before_reply:
+                    break
+                writer.write(TPLinkSmartHomeProtocol.encrypt(request))
+                await writer.drain()
+                if close_after_reply:
+                    break
+            writer.close()
+
+        async def serve():
+            server = await asyncio.start_server(handle, "127.0.0.1", 0)
+            port = server.sockets[0].getsockname()[1]
+            try:
+                return await run(port)
+            finally:
+                server.close()
+                await server.wait_closed()
+
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(serve()), len(connections)
+        finally:
+            loop.close()
+
+    def test_persistent_connection(self):
+        async def run(port):
+            protocol = TPLinkSmartHomeProtocol()
+            await protocol.connect("127.0.0.1", port)
+            first = await protocol.query("127.0.0.1", {"foo": 1}, port)
+            second = await protocol.query("127.0.0.1", {"bar": 2}, port)
+            await protocol.close()
+            return first, second
+
+        (first, second), connections = self.run_echo_server(run)
+        self.assertEqual(first, {"foo": 1})
+        self.assertEqual(second, {"bar": 2})
+        self.assertEqual(connections, 1)
+
+    def test_persistent_connection_closed_by_device(self):
+        async def run(port):
+            protocol = TPLinkSmartHomeProtocol()
+            await protocol.connect("127.0.0.1", port)
+            first = await protocol.query("127.0.0.1", {"foo": 1}, port)
+            await asyncio.sleep(0.1)
+            second = await protocol.query("127.0.0.1", {"bar": 2}, port)
+            await protocol.close()
+            return first, second
+
+        (first, second), connections = self.run_echo_server(run, close_after_reply=True)
+        self.assertEqual(first, {"foo": 1})
+        self.assertEqual(second, {"bar": 2})
+        self.assertEqual(connections, 2)
+
+    def test_persistent_connection_not_resent(self):
+        async def run(port):
+            protocol = TPLinkSmartHomeProtocol()
+            await protocol.connect("127.0.0.1", port)
+            try:
+                with self.assertRaises(ConnectionResetError):
+                    await protocol.query("127.0.0.1", {"foo": 1}, port)
+            finally:
+                await protocol.close()
+
+        _, connections = self.run_echo_server(run, close_before_reply=True)
+        self.assertEqual(connections, 1)
+        self.assertEqual(self.requests, ['{"foo": 1}'])
+
+    def test_query_on_class(self):
+        async def run(port):
+            return await TPLinkSmartHomeProtocol.query("127.0.0.1", {"foo": 1}, port)
+
+        response, _ = self.run_echo_server(run)
+        self.assertEqual(response, {"foo": 1})